@@ -1,10 +1,16 @@
 import streamlit as st
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import yfinance as yf
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+from numba import njit
 from datetime import datetime, timedelta
-import ta
-from streamlit_autorefresh import st_autorefresh
-import time
+import threading
+import asyncio
+import aiohttp
+from cachetools import TTLCache
 
 # Mapping of stock tickers to names
 stock_names = {
@@ -22,92 +28,282 @@ stock_names = {
     'RELIANCE.NS': 'Reliance Industries Limited',
     'TCS.NS': 'Tata Consultancy Services',
 }
+TICKERS = tuple(stock_names)
+INTERVALS = ('1m', '5m', '15m', '30m', '1h', '1d', '1wk')
 
-# Fetch stock data based on the ticker, period, and interval
-def fetch_stock_data(ticker, period, interval):
+# Yahoo Finance chart endpoint used for the sidebar quotes
+yahoo_chart_url = 'https://query1.finance.yahoo.com/v8/finance/chart/{ticker}'
+
+# Seconds between auto-refreshes; cached results expire on the same schedule
+refresh_interval = 20
+
+# Cheap cache key for DataFrame arguments: shape plus the last row instead of hashing every cell
+def _frame_key(df):
+    return df.shape, df.index[-1], df.iloc[-1].tolist()
+
+# Convert an index to US/Eastern straight from its int64 UTC values; naive timestamps are taken as UTC
+def _to_eastern(index):
+    return pd.DatetimeIndex(index.values, name=index.name).tz_localize('UTC').tz_convert('US/Eastern')
+
+# Download raw stock data from Yahoo Finance without the progress bar or price adjustment; raises on network errors
+def download_stock_data(tickers, period, interval, **kwargs):
+    end_date = datetime.now()
+    if period == '1wk':
+        start_date = end_date - timedelta(days=7)
+        return yf.download(tickers, start=start_date, end=end_date, interval=interval, timeout=10,
+                           progress=False, auto_adjust=False, **kwargs)
+    elif period == '1d':
+        return yf.download(tickers, period='1d', interval=interval, timeout=10,
+                           progress=False, auto_adjust=False, **kwargs)
+    else:
+        return yf.download(tickers, period=period, interval=interval, timeout=10,
+                           progress=False, auto_adjust=False, **kwargs)
+
+# Split-out per-ticker frames keyed by (ticker, period, interval), so a new ticker combination
+# reuses whatever it has in common with earlier fetches. This is the only cache in front of
+# yf.download, which keeps staleness bounded by refresh_interval. Streamlit re-executes this
+# script on every rerun, so the cache and its lock live in st.cache_resource to survive reruns
+# and be shared by every session. TTLCache is not thread-safe, hence the lock.
+@st.cache_resource
+def _frame_cache():
+    return TTLCache(maxsize=128, ttl=refresh_interval), threading.Lock()
+
+# Download several tickers with one yf.download call and split the result into {ticker: data}
+def _download_many(tickers, period, interval):
+    cache, lock = _frame_cache()
     try:
-        end_date = datetime.now()
-        if period == '1wk':
-            start_date = end_date - timedelta(days=7)
-            data = yf.download(ticker, start=start_date, end=end_date, interval=interval)
-        elif period == '1d':
-            data = yf.download(ticker, period='1d', interval=interval)
-        else:
-            data = yf.download(ticker, period=period, interval=interval)
-        if data.empty:
-            st.warning(f"No data found for {ticker}. It may be delisted or there is no price data available.")
-            return None
-        return data
+        data = download_stock_data(" ".join(tickers), period, interval, group_by='ticker', threads=True)
     except Exception as e:
-        st.error(f"Error fetching data for {ticker}: {e}")
+        st.error(f"Error fetching data for {', '.join(tickers)}: {e}")
+        return dict.fromkeys(tickers)
+    # Convert the shared index once, before splitting it per ticker
+    if not data.empty:
+        data.index = _to_eastern(data.index)
+
+    frames = {}
+    for t in tickers:
+        # A single ticker comes back with flat columns, several with a (ticker, field) MultiIndex
+        if len(tickers) == 1:
+            frame = data
+        elif t in data.columns.get_level_values(0):
+            frame = data[t].dropna(how='all')
+            # Padding onto the shared index upcasts Volume to float; restore the integer column
+            frame['Volume'] = frame['Volume'].fillna(0).astype('int64')
+        else:
+            frame = data.iloc[0:0]
+        if frame.empty:
+            st.warning(f"No data found for {t}. It may be delisted or there is no price data available.")
+            frames[t] = None
+        else:
+            frames[t] = frame
+            with lock:
+                cache[(t, period, interval)] = frame
+    return frames
+
+# Fetch several tickers as {ticker: data}, downloading only those not in the frame cache
+def fetch_many(tickers, period, interval):
+    tickers = list(dict.fromkeys(tickers))
+    cache, lock = _frame_cache()
+    with lock:
+        frames = {t: cache.get((t, period, interval)) for t in tickers}
+    missing = [t for t in tickers if frames[t] is None]
+    if missing:
+        frames.update(_download_many(missing, period, interval))
+    # Hand out copies: callers process frames in place, and the cached frames are shared across sessions
+    return {t: None if frame is None else frame.copy() for t, frame in frames.items()}
+
+# Fetch one ticker's last price and previous close from the chart endpoint's metadata.
+# Only `meta` is read, so ask for a single daily bar to keep the payload small.
+async def _fetch_quote(session, ticker):
+    params = {'range': '1d', 'interval': '1d'}
+    async with session.get(yahoo_chart_url.format(ticker=ticker), params=params) as response:
+        response.raise_for_status()
+        payload = await response.json()
+    result = payload['chart']['result']
+    if not result:
         return None
+    meta = result[0]['meta']
+    return meta['regularMarketPrice'], meta['chartPreviousClose']
 
-# Process data to ensure it is timezone-aware and has the correct format
+# Run every ticker's request concurrently over one pooled session
+async def _fetch_quotes(tickers):
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout) as session:
+        return await asyncio.gather(*(_fetch_quote(session, t) for t in tickers), return_exceptions=True)
+
+# Fetch {ticker: (last_price, previous_close)} for several tickers without building any DataFrame.
+# Also returns when the quotes were downloaded; the stamp is cached with them, so it only moves on a real fetch.
+@st.cache_data(ttl=refresh_interval, show_spinner=False)
+def fetch_quotes(tickers):
+    tickers = list(dict.fromkeys(tickers))
+    fetched_at = pd.Timestamp.now(tz='US/Eastern')
+    results = asyncio.run(_fetch_quotes(tickers))
+
+    quotes = {}
+    for t, result in zip(tickers, results):
+        if isinstance(result, Exception):
+            st.error(f"Error fetching data for {t}: {result}")
+            quotes[t] = None
+        elif result is None:
+            st.warning(f"No data found for {t}. It may be delisted or there is no price data available.")
+            quotes[t] = None
+        else:
+            quotes[t] = result
+    return fetched_at, quotes
+
+# Process data into the display format; fetch_many already returns a US/Eastern index.
+# Prices are stored Arrow-backed so st.dataframe can hand the buffers to the frontend as-is.
 def process_data(data):
-    if data.index.tzinfo is None:
-        data.index = data.index.tz_localize('UTC')
-    data.index = data.index.tz_convert('US/Eastern')
     data.reset_index(inplace=True)
     data.rename(columns={'Date': 'Datetime'}, inplace=True)
-    return data
+    return data.astype({c: pd.ArrowDtype(pa.float64()) for c in ('Open', 'High', 'Low', 'Close')})
+
+# Column as a float64 NumPy array with NaN for missing values, whether it is NumPy- or Arrow-backed
+def _values(series):
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
 
-# Calculate basic metrics from the stock data
+# Calculate basic metrics from the stock data, reducing each column's NumPy array once
 def calculate_metrics(data):
-    last_close = data['Close'].iloc[-1]
-    prev_close = data['Close'].iloc[0]
+    close = _values(data['Close'])
+    last_close = close[-1]
+    prev_close = close[0]
     change = last_close - prev_close
     pct_change = (change / prev_close) * 100
-    high = data['High'].max()
-    low = data['Low'].min()
-    volume = data['Volume'].sum()
+    high = np.nanmax(_values(data['High']))
+    low = np.nanmin(_values(data['Low']))
+    volume = np.nansum(data['Volume'].to_numpy())
     return last_close, change, pct_change, high, low, volume
 
-# Add simple moving average (SMA) and exponential moving average (EMA) indicators
-def add_technical_indicators(data):
-    data['SMA_20'] = ta.trend.sma_indicator(data['Close'], window=20)
-    data['EMA_20'] = ta.trend.ema_indicator(data['Close'], window=20)
-    return data
+# Rolling mean over a window of w values, kept as a running sum; NaN until the window is full of valid values
+@njit(cache=True)
+def _sma_running_sum(close, w):
+    out = np.full(close.shape[0], np.nan)
+    total = 0.0
+    valid = 0
+    for i in range(close.shape[0]):
+        if not np.isnan(close[i]):
+            total += close[i]
+            valid += 1
+        if i >= w and not np.isnan(close[i - w]):
+            total -= close[i - w]
+            valid -= 1
+        if valid == w:
+            out[i] = total / w
+    return out
 
-# Adding RSI and MACD
-def add_more_indicators(data):
-    data['RSI'] = ta.momentum.rsi(data['Close'], window=14)
-    data['MACD'] = ta.trend.macd(data['Close'])
-    data['MACD_Signal'] = ta.trend.macd_signal(data['Close'])
+# EMA with pandas' ewm(span=span, min_periods=span, adjust=False) semantics, NaN gaps included
+@njit(cache=True)
+def _ema(values, span):
+    alpha = 2.0 / (span + 1.0)
+    out = np.full(values.shape[0], np.nan)
+    weighted = np.nan
+    old_wt = 1.0
+    nobs = 0
+    for i in range(values.shape[0]):
+        x = values[i]
+        is_obs = not np.isnan(x)
+        if is_obs:
+            nobs += 1
+        if not np.isnan(weighted):
+            old_wt *= 1.0 - alpha
+            if is_obs:
+                weighted = (old_wt * weighted + alpha * x) / (old_wt + alpha)
+                old_wt = 1.0
+        elif is_obs:
+            weighted = x
+        if nobs >= span:
+            out[i] = weighted
+    return out
+
+# RSI with Wilder's smoothing in a single pass; a window without losses reads 100
+@njit(cache=True)
+def _rsi(close, period):
+    alpha = 1.0 / period
+    out = np.full(close.shape[0], np.nan)
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, close.shape[0]):
+        delta = close[i] - close[i - 1]
+        # NaN deltas compare false and count as neither gain nor loss
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        avg_gain = (1.0 - alpha) * avg_gain + alpha * gain
+        avg_loss = (1.0 - alpha) * avg_loss + alpha * loss
+        if i + 1 >= period:
+            out[i] = 100.0 if avg_loss == 0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return out
+
+# Add SMA/EMA 20, RSI and MACD with its signal line, reading the Close column into NumPy once
+@st.cache_data(ttl=refresh_interval, show_spinner=False, hash_funcs={pd.DataFrame: _frame_key})
+def compute_indicators(data):
+    close = _values(data['Close'])
+    # MACD (12/26) and its 9-period signal line
+    macd = _ema(close, 12) - _ema(close, 26)
+    # Kernels run in float64; the stored columns only need dashboard precision
+    data[['SMA_20', 'EMA_20', 'RSI', 'MACD', 'MACD_Signal']] = np.column_stack([
+        _sma_running_sum(close, 20),
+        _ema(close, 20),
+        _rsi(close, 14),
+        macd,
+        _ema(macd, 9),
+    ]).astype(np.float32)
     return data
 
+# Serialize data for the CSV download; cached so reruns don't rebuild the payload
+@st.cache_data(ttl=60, show_spinner=False)
+def df_to_csv_bytes(df):
+    return df.to_csv().encode('utf-8')
+
+# Real-time prices for every symbol; only this fragment reruns on the refresh timer, not the whole page.
+# Fragments can't write to st.sidebar directly, so call it inside a `with st.sidebar:` block.
+@st.fragment(run_every=refresh_interval)
+def realtime_sidebar():
+    st.header('Real-Time Stock Prices')
+    fetched_at, quotes = fetch_quotes(TICKERS)
+    # The fragment redraws only when it reruns, so a countdown would always read the full interval
+    st.write(f"Last refreshed at {fetched_at:%H:%M:%S} ET")
+    quotes = {t: quote for t, quote in quotes.items() if quote is not None}
+    # Changes for every symbol in one vectorized pass; the loop below only formats
+    prices = np.array(list(quotes.values()), dtype=np.float64).reshape(-1, 2)
+    last_prices = prices[:, 0]
+    changes = last_prices - prices[:, 1]
+    pct_changes = changes / prices[:, 1] * 100
+    for symbol, last_price, change, pct_change in zip(quotes, last_prices, changes, pct_changes):
+        st.metric(f"{stock_names[symbol]}", f"{last_price:.2f} USD", f"{change:.2f} ({pct_change:.2f}%)")
+
 # Set up Streamlit page layout
 st.set_page_config(layout="wide")
 st.title('Real Time Stock Dashboard')
 
 # Sidebar for user input parameters
 st.sidebar.header('Chart Parameters')
-ticker = st.sidebar.selectbox('Select Ticker', list(stock_names.keys()), index=0)
+ticker = st.sidebar.selectbox('Select Ticker', TICKERS, index=0)
 time_period = st.sidebar.selectbox('Time Period', ['1d', '1wk', '1mo', '1y', 'max'])
 
 # Enhanced Interval Selection
-custom_intervals = ['1m', '5m', '15m', '30m', '1h', '1d', '1wk']
-interval = st.sidebar.selectbox('Data Interval', custom_intervals)
+interval = st.sidebar.selectbox('Data Interval', INTERVALS)
 chart_type = st.sidebar.selectbox('Chart Type', ['Candlestick', 'Line'])
 indicators = st.sidebar.multiselect('Technical Indicators', ['SMA 20', 'EMA 20', 'RSI', 'MACD'])
 
 # Sidebar option for stock comparison
 st.sidebar.subheader("Compare Stocks")
-compare_ticker = st.sidebar.selectbox("Select Ticker to Compare", list(stock_names.keys()))
-
-# Auto-refresh logic (refresh every 10 seconds) and countdown
-refresh_interval = 20
-st_autorefresh(interval=refresh_interval * 1000, key="datarefresh")
-last_refresh_time = time.time()
-time_since_refresh = int(time.time() - last_refresh_time)
-countdown = refresh_interval - time_since_refresh
-st.sidebar.write(f"Auto-refresh in {countdown} seconds")
+compare_ticker = st.sidebar.selectbox("Select Ticker to Compare", TICKERS)
 
 # MAIN CONTENT AREA
-data = fetch_stock_data(ticker, time_period, interval)
+# The main and comparison panels share one download
+frames = fetch_many([ticker, compare_ticker], time_period, interval)
+data = frames[ticker]
 if data is not None:
-    data = process_data(data)
-    data = add_technical_indicators(data)
-    data = add_more_indicators(data)
+    # Reuse this session's processed frame while the download's tail is unchanged (e.g. market closed).
+    # The last close is part of the signature because a still-forming candle keeps its timestamp.
+    sig = (ticker, time_period, interval, len(data), data.index[-1].value, data['Close'].iloc[-1])
+    if st.session_state.get('last_sig') == sig:
+        data = st.session_state.last_data
+    else:
+        data = process_data(data)
+        data = compute_indicators(data)
+        st.session_state.last_sig = sig
+        st.session_state.last_data = data
     last_close, change, pct_change, high, low, volume = calculate_metrics(data)
 
     # Display main metrics
@@ -117,37 +313,54 @@ if data is not None:
     col2.metric("Low", f"{low:.2f} USD")
     col3.metric("Volume", f"{volume:,}")
 
-    # Plot the stock price chart
-    fig = go.Figure()
+    # Plot the stock price chart; every trace shares one x array (Eastern wall-clock time)
+    x = data['Datetime'].dt.tz_localize(None).to_numpy()
+    # RSI and MACD get their own rows under the price row, in one figure
+    panels = [name for name in ('RSI', 'MACD') if name in indicators]
+    traces = []
+    rows = []
     if chart_type == 'Candlestick':
-        fig.add_trace(go.Candlestick(
-            x=data['Datetime'],
-            open=data['Open'],
-            high=data['High'],
-            low=data['Low'],
-            close=data['Close']
+        traces.append(go.Candlestick(
+            x=x,
+            open=_values(data['Open']),
+            high=_values(data['High']),
+            low=_values(data['Low']),
+            close=_values(data['Close'])
         ))
     else:
-        fig.add_trace(go.Scatter(x=data['Datetime'], y=data['Close'], mode='lines', name='Close Price'))
+        traces.append(go.Scatter(x=x, y=_values(data['Close']), mode='lines', name='Close Price'))
+    rows.append(1)
 
     # Add selected technical indicators to the chart
     for indicator in indicators:
         if indicator == 'SMA 20':
-            fig.add_trace(go.Scatter(x=data['Datetime'], y=data['SMA_20'], name='SMA 20'))
+            traces.append(go.Scatter(x=x, y=data['SMA_20'].to_numpy(), name='SMA 20'))
+            rows.append(1)
         elif indicator == 'EMA 20':
-            fig.add_trace(go.Scatter(x=data['Datetime'], y=data['EMA_20'], name='EMA 20'))
+            traces.append(go.Scatter(x=x, y=data['EMA_20'].to_numpy(), name='EMA 20'))
+            rows.append(1)
         elif indicator == 'RSI':
-            st.subheader('RSI Indicator')
-            st.line_chart(data['RSI'])
+            traces.append(go.Scatter(x=x, y=data['RSI'].to_numpy(), name='RSI'))
+            rows.append(2 + panels.index('RSI'))
         elif indicator == 'MACD':
-            st.subheader('MACD Indicator')
-            st.line_chart(data[['MACD', 'MACD_Signal']])
+            traces.append(go.Scatter(x=x, y=data['MACD'].to_numpy(), name='MACD'))
+            traces.append(go.Scatter(x=x, y=data['MACD_Signal'].to_numpy(), name='MACD Signal'))
+            rows.extend([2 + panels.index('MACD')] * 2)
+    fig = make_subplots(rows=1 + len(panels), cols=1, shared_xaxes=True, vertical_spacing=0.03,
+                        row_heights=[1 - 0.2 * len(panels)] + [0.2] * len(panels))
+    fig.add_traces(traces, rows=rows, cols=[1] * len(traces))
 
     # Format graph
     fig.update_layout(title=f'{stock_names[ticker]} {time_period.upper()} Chart',
-                      xaxis_title='Time',
                       yaxis_title='Price (USD)',
-                      height=680)
+                      height=680,
+                      uirevision=f'{ticker}-{time_period}-{interval}')
+    for row, name in enumerate(panels, start=2):
+        fig.update_yaxes(title_text=name, row=row, col=1)
+    fig.update_xaxes(title_text='Time', row=1 + len(panels), col=1)
+    if panels:
+        # The candlestick range slider would sit on top of the indicator rows
+        fig.update_xaxes(rangeslider_visible=False)
     st.plotly_chart(fig, use_container_width=True)
 
     # Display historical data and technical indicators
@@ -159,18 +372,19 @@ if data is not None:
     # Download data as CSV
     st.download_button(
         label="Download Data as CSV",
-        data=data.to_csv().encode('utf-8'),
+        data=df_to_csv_bytes(data),
         file_name=f'{ticker}_data.csv',
         mime='text/csv'
     )
 
-# Stock comparison chart
-compare_data = fetch_stock_data(compare_ticker, time_period, interval)
+# Stock comparison chart; the main frame is already processed, so reuse it when both tickers match
+compare_data = data if compare_ticker == ticker else frames[compare_ticker]
 if compare_data is not None:
-    compare_data = process_data(compare_data)
+    if compare_ticker != ticker:
+        compare_data = process_data(compare_data)
     fig_compare = go.Figure()
-    fig_compare.add_trace(go.Scatter(x=data['Datetime'], y=data['Close'], name=f"{ticker} Close Price"))
-    fig_compare.add_trace(go.Scatter(x=compare_data['Datetime'], y=compare_data['Close'], name=f"{compare_ticker} Close Price"))
+    fig_compare.add_trace(go.Scatter(x=data['Datetime'], y=_values(data['Close']), name=f"{ticker} Close Price"))
+    fig_compare.add_trace(go.Scatter(x=compare_data['Datetime'], y=_values(compare_data['Close']), name=f"{compare_ticker} Close Price"))
     fig_compare.update_layout(title=f'Comparison of {stock_names[ticker]} and {stock_names[compare_ticker]}',
                               xaxis_title='Time',
                               yaxis_title='Price (USD)',
@@ -178,15 +392,8 @@ if compare_data is not None:
     st.plotly_chart(fig_compare, use_container_width=True)
 
 # Sidebar section for real-time stock prices of selected symbols
-st.sidebar.header('Real-Time Stock Prices')
-for symbol in stock_names.keys():
-    real_time_data = fetch_stock_data(symbol, '1d', '1m')
-    if real_time_data is not None and not real_time_data.empty:
-        real_time_data = process_data(real_time_data)
-        last_price = real_time_data['Close'].iloc[-1]
-        change = last_price - real_time_data['Open'].iloc[0]
-        pct_change = (change / real_time_data['Open'].iloc[0]) * 100
-        st.sidebar.metric(f"{stock_names[symbol]}", f"{last_price:.2f} USD", f"{change:.2f} ({pct_change:.2f}%)")
+with st.sidebar:
+    realtime_sidebar()
 
 # Sidebar information section
 st.sidebar.subheader('About')